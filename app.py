@@ -1,16 +1,21 @@
 import streamlit as st
-import google.generativeai as genai
-import pypdf
-import docx
-from docx import Document as DocxDocument
-from docx.shared import Pt, Inches, RGBColor
-from docx.enum.text import WD_ALIGN_PARAGRAPH
 import io
 import re
 import json
+import orjson
 import time
-import zipfile
+import bisect
+import collections
+import functools
+import hashlib
+import itertools
+import os
+import pathlib
+import tempfile
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime
+from typing import TypedDict
 
 
 # ============================================================
@@ -33,73 +38,325 @@ STATE_DEFAULTS = {
     "ats_analysis": None,
     "optimized_resume_md": None,
     "optimize_used": False,
+    # Exported .docx bytes, built once per document and reused on every rerun
+    "resume_docx": None,
+    "cover_letter_docx": None,
+    "interview_docx": None,
+    "optimized_resume_docx": None,
+    # Per-section "ok"/"fail" from the last Step 2 run; re-entry only regenerates failures
+    "section_status": None,
 }
-for k, v in STATE_DEFAULTS.items():
-    if k not in st.session_state:
-        st.session_state[k] = v
+if "_inited" not in st.session_state:
+    st.session_state.update({**STATE_DEFAULTS, "_inited": True})
 
 
 # ============================================================
 # 2. MODEL INITIALIZATION
 # ============================================================
 
-def init_model(api_key: str):
-    genai.configure(api_key=api_key)
+# google.generativeai, python-docx, pypdf, and PyMuPDF are imported where they are
+# first needed so the landing page renders without loading them.
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _list_model_names(api_key: str) -> list:
+    import google.generativeai as genai
+    return [m.name for m in genai.list_models()]
+
+
+_CONFIGURED_KEY = None
+
+
+@st.cache_resource(show_spinner=False)
+def init_model(api_key: str, preferred: str = None):
+    global _CONFIGURED_KEY
+    import google.generativeai as genai
+    if _CONFIGURED_KEY != api_key:
+        genai.configure(api_key=api_key)
+        _CONFIGURED_KEY = api_key
+    # A configured model name replaces the full listing with one lookup. GenerativeModel
+    # never checks its name, so a misspelled or retired pin is caught here instead of
+    # failing every call.
+    if preferred:
+        from google.api_core import exceptions as google_exceptions
+        try:
+            genai.get_model(preferred)
+            return genai.GenerativeModel(preferred)
+        except (google_exceptions.NotFound, google_exceptions.InvalidArgument, ValueError):
+            pass  # ValueError: get_model rejects malformed names client-side
     try:
-        for m in genai.list_models():
-            if "flash" in m.name:
-                return genai.GenerativeModel(m.name)
-        for m in genai.list_models():
-            if "pro" in m.name:
-                return genai.GenerativeModel(m.name)
+        names = _list_model_names(api_key)
     except Exception:
-        pass
-    return genai.GenerativeModel("gemini-1.5-flash")
+        names = []
+    # First flash model, else first pro model, from one listing
+    chosen = next((n for n in names if "flash" in n), None) or next((n for n in names if "pro" in n), None)
+    return genai.GenerativeModel(chosen or "gemini-1.5-flash")
 
 
 # ============================================================
 # 3. FILE READER
 # ============================================================
 
+def _extract_pdf_text(data: bytes) -> str:
+    # MuPDF's C extractor is much faster than pypdf; pypdf stays as a fallback for
+    # files MuPDF refuses to open.
+    try:
+        import fitz
+        with fitz.open(stream=data, filetype="pdf") as pdf:
+            return "\n".join(page.get_text() for page in pdf).strip()
+    except Exception:
+        import pypdf
+        reader = pypdf.PdfReader(io.BytesIO(data))
+        return "\n".join((page.extract_text() or "") for page in reader.pages).strip()
+
+
 def read_file(uploaded_file) -> str:
-    name = uploaded_file.name.lower()
+    # Every widget interaction reruns the script; only parse a given upload once
+    return _read_file_cached(uploaded_file.getvalue(), uploaded_file.name)
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def _read_file_cached(data: bytes, filename: str) -> str:
+    name = filename.lower()
     if name.endswith(".pdf"):
-        reader = pypdf.PdfReader(uploaded_file)
-        pages = [page.extract_text() or "" for page in reader.pages]
-        text = "\n".join(pages).strip()
+        text = _extract_pdf_text(data)
         if not text:
             raise ValueError("PDF appears to be scanned/image-only.")
         return text
     elif name.endswith(".docx"):
-        doc = docx.Document(uploaded_file)
-        text = "\n".join([p.text for p in doc.paragraphs]).strip()
+        import docx
+        # Parsers issue many small reads; serve them from one in-memory copy
+        doc = docx.Document(io.BytesIO(data))
+        text = "\n".join(p.text for p in doc.paragraphs).strip()
         if not text:
             raise ValueError("DOCX file appears empty.")
         return text
-    raise ValueError(f"Unsupported file type: {uploaded_file.name}")
+    raise ValueError(f"Unsupported file type: {filename}")
 
 
 # ============================================================
 # 4. LLM CALL WRAPPER
 # ============================================================
 
-def call_model(model, prompt: str, retries: int = 2) -> str:
+GEMINI_RPM = 60
+GEMINI_TPM = 1_000_000
+
+
+class RateLimiter:
+    """Sliding one-minute RPM/TPM budget for a session's Gemini calls, tightened for a window after a 429."""
+
+    def __init__(self, rpm: int = GEMINI_RPM, tpm: int = GEMINI_TPM, window: float = 60.0,
+                 max_wait: float = 15.0):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.window = window
+        self.max_wait = max_wait
+        self._calls = collections.deque()  # (monotonic timestamp, estimated tokens)
+        self._tokens = 0
+        self._throttled_rpm = None
+        self._throttled_until = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens: int, force: bool = False) -> float:
+        """Record a call and return 0, or return the seconds to wait before asking again."""
+        with self._lock:
+            now = time.monotonic()
+            while self._calls and now - self._calls[0][0] >= self.window:
+                self._tokens -= self._calls.popleft()[1]
+            rpm = self.rpm
+            if self._throttled_rpm is not None:
+                if now < self._throttled_until:
+                    rpm = self._throttled_rpm
+                else:
+                    self._throttled_rpm = None
+            if force or not self._calls or (len(self._calls) < rpm and self._tokens + tokens <= self.tpm):
+                self._calls.append((now, tokens))
+                self._tokens += tokens
+                return 0.0
+            return self._calls[0][0] + self.window - now
+
+    def acquire(self, tokens: int):
+        deadline = time.monotonic() + self.max_wait
+        wait = self._reserve(tokens)
+        while wait > 0:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                # Let the call through and leave any further pacing to the retry backoff
+                self._reserve(tokens, force=True)
+                return
+            time.sleep(min(wait, remaining))
+            wait = self._reserve(tokens)
+
+    def record_rate_limited(self):
+        with self._lock:
+            # The call that was rejected is already in the window. The lower budget
+            # only lasts for this window, so one transient 429 cannot pin it for good.
+            self._throttled_rpm = max(1, len(self._calls) - 1)
+            self._throttled_until = time.monotonic() + self.window
+
+
+def get_rate_limiter() -> RateLimiter:
+    if "_rate_limiter" not in st.session_state:
+        st.session_state._rate_limiter = RateLimiter()
+    return st.session_state._rate_limiter
+
+
+def _estimate_tokens(prompt: str) -> int:
+    return len(prompt) // 4
+
+
+def _retry_delay(err: Exception, limiter: RateLimiter, attempt: int) -> float:
+    from google.api_core import exceptions as google_exceptions
+    if isinstance(err, google_exceptions.ResourceExhausted):
+        limiter.record_rate_limited()
+    return 1.5 * (attempt + 1)
+
+
+_JSON_DECODER = json.JSONDecoder()
+
+
+def _strip_fences(text: str) -> str:
+    # Same result as re.sub(r"^```(?:json)?\s*|\s*```$", "", text) with plain string ops
+    text = text.strip()
+    if text.startswith("```"):
+        text = text[3:]
+        if text.startswith("json"):
+            text = text[4:]
+        text = text.lstrip()
+        if text.endswith("```"):
+            text = text[:-3].rstrip()
+    return text
+
+
+def json_config(schema: dict = None) -> dict:
+    """generation_config for Gemini's JSON mode, constrained to ``schema`` when given."""
+    config = {"response_mime_type": "application/json"}
+    if schema:
+        config["response_schema"] = schema
+    return config
+
+
+def call_model(model, prompt: str, retries: int = 2, limiter: RateLimiter = None, chunks: list = None,
+               generation_config: dict = None) -> str:
+    """Call Gemini with rate limiting and retries, streaming into ``chunks`` when given."""
+    if limiter is None:
+        limiter = get_rate_limiter()
     last_err = None
     for attempt in range(retries + 1):
         try:
-            response = model.generate_content(prompt)
-            text = response.text.strip()
-            if text.startswith("```"):
-                text = re.sub(r"^```(?:json)?\s*", "", text)
-                text = re.sub(r"\s*```$", "", text)
+            limiter.acquire(_estimate_tokens(prompt))
+            if chunks is None:
+                response = model.generate_content(prompt, generation_config=generation_config)
+                return _strip_fences(response.text)
+            del chunks[:]
+            for chunk in model.generate_content(prompt, stream=True, generation_config=generation_config):
+                chunks.append(chunk.text)
+            return _strip_fences("".join(chunks))
+        except Exception as e:
+            last_err = e
+            delay = _retry_delay(e, limiter, attempt)
+            if attempt < retries and delay:
+                time.sleep(delay)
+    raise last_err
+
+
+def call_model_json(model, prompt: str, retries: int = 2, generation_config: dict = None) -> str:
+    """Stream a JSON answer and return the first complete JSON value as soon as it parses."""
+    limiter = get_rate_limiter()
+    last_err = None
+    for attempt in range(retries + 1):
+        try:
+            limiter.acquire(_estimate_tokens(prompt))
+            buf = []
+            text = ""
+            for chunk in model.generate_content(prompt, stream=True, generation_config=generation_config):
+                buf.append(chunk.text)
+                text = _strip_fences("".join(buf))
+                try:
+                    _, end = _JSON_DECODER.raw_decode(text)
+                except ValueError:
+                    continue
+                return text[:end]
             return text
         except Exception as e:
             last_err = e
-            if attempt < retries:
-                time.sleep(1.5 * (attempt + 1))
+            delay = _retry_delay(e, limiter, attempt)
+            if attempt < retries and delay:
+                time.sleep(delay)
     raise last_err
 
 
+def _cache_key(model, prompt: str) -> str:
+    normalized = " ".join(prompt.split())
+    return hashlib.sha256(f"{model.model_name}\x00{normalized}".encode("utf-8")).hexdigest()
+
+
+def call_model_cached(model, prompt: str, validate=None, fetch=call_model, cache: dict = None) -> str:
+    """Return the session's stored response for an identical prompt, else ``fetch`` and store it."""
+    if cache is None:
+        cache = st.session_state.setdefault("_llm_cache", {})
+    key = _cache_key(model, prompt)
+    if key not in cache:
+        text = fetch(model, prompt)
+        if validate:
+            validate(text)
+        cache[key] = text
+    return cache[key]
+
+
+# Validated analysis responses, one file per sha256 prompt key. Files expire with
+# the in-memory TTL and only the newest _LLM_CACHE_MAX_FILES are kept.
+_LLM_CACHE_DIR = pathlib.Path(os.environ.get("LLM_CACHE_DIR") or pathlib.Path(tempfile.gettempdir()) / "92y-llmcache")
+_LLM_CACHE_TTL = 3600
+_LLM_CACHE_MAX_FILES = 256
+
+
+def _prune_llm_cache():
+    now = time.time()
+    entries = []
+    for path in _LLM_CACHE_DIR.glob("*.json"):
+        try:
+            entries.append((path.stat().st_mtime, path))
+        except OSError:
+            pass
+    entries.sort(reverse=True)
+    for i, (mtime, path) in enumerate(entries):
+        if i >= _LLM_CACHE_MAX_FILES or now - mtime > _LLM_CACHE_TTL:
+            path.unlink(missing_ok=True)
+
+
+@st.cache_data(show_spinner=False, ttl=_LLM_CACHE_TTL)
+def cached_llm_call(prompt: str, model_name: str, _model, _validate=None, _fetch=call_model) -> str:
+    """Cross-session cache for the analysis prompts, backed by files under _LLM_CACHE_DIR."""
+    path = _LLM_CACHE_DIR / f"{_cache_key(_model, prompt)}.json"
+    try:
+        if time.time() - path.stat().st_mtime <= _LLM_CACHE_TTL:
+            return path.read_text(encoding="utf-8")
+    except OSError:
+        pass
+    text = _fetch(_model, prompt)
+    if _validate:
+        _validate(text)
+    try:
+        _LLM_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+        tmp.write_text(text, encoding="utf-8")
+        os.replace(tmp, path)
+        _prune_llm_cache()
+    except OSError:
+        pass  # read-only or full disk: the in-memory cache still applies
+    return text
+
+
+def parse_keywords(raw: str) -> list:
+    kws = orjson.loads(raw)
+    if not isinstance(kws, list) or len(kws) < 3:
+        raise ValueError("Too few keywords returned.")
+    return kws
+
+
+_FENCE_LINE_RE = re.compile(r"^```.*$", re.MULTILINE)
+
+
 def clean_markdown(text: str) -> str:
     """Remove inline backticks and code fences that break resume formatting."""
     if not text:
@@ -107,7 +364,7 @@ def clean_markdown(text: str) -> str:
     # Remove inline backticks (single `)
     text = text.replace("`", "")
     # Remove any leftover fenced code blocks
-    text = re.sub(r"^```.*$", "", text, flags=re.MULTILINE)
+    text = _FENCE_LINE_RE.sub("", text)
     return text.strip()
 
 
@@ -206,6 +463,19 @@ INDUSTRY_TONE = {
 }
 
 
+def _bullets(items) -> str:
+    """Render items as the indented "  - item" lines the prompts use."""
+    return "\n".join(f"  - {item}" for item in items)
+
+
+def _numbered_list(items) -> str:
+    return "\n".join(f"  {i}. {item}" for i, item in enumerate(items, 1))
+
+
+_TRANS_STR = _bullets(f"{k} -> {v}" for k, v in TRANSLATION_MAP.items())
+_GHOST_STRS = {code: _bullets(skills) for code, skills in GHOSTWRITER.items()}
+
+
 # ============================================================
 # 6. PROMPT BUILDERS
 # ============================================================
@@ -253,16 +523,22 @@ def _gap_statement(gap_info):
 
 
 def _context_block(rank, years, industry, target_title, keywords, user_data, contact_info=None, gap_info=None):
-    rank_code = rank.split(" ")[0]
-    ghost = GHOSTWRITER.get(rank_code, GHOSTWRITER["E-5"])
-    trans = "\n".join(f"  - {k} -> {v}" for k, v in TRANSLATION_MAP.items())
-    gh = "\n".join(f"  - {s}" for s in ghost)
-    kw = "\n".join(f"  {i+1}. {k}" for i, k in enumerate(keywords))
     contact_str = ""
     if contact_info:
         name, contact_line = _contact_block(contact_info)
         contact_str = f"\n\nCANDIDATE CONTACT INFO (use exactly as provided):\n  Name: {name}\n  Contact Line: {contact_line}"
     gap_str = _gap_statement(gap_info)
+    return _render_context(rank, years, industry, target_title, tuple(keywords), user_data, contact_str, gap_str)
+
+
+# Resume, cover letter, and interview prep share one context per generation batch
+@functools.lru_cache(maxsize=8)
+def _render_context(rank, years, industry, target_title, keywords, user_data, contact_str, gap_str,
+                    _trans=_TRANS_STR, _ghosts=_GHOST_STRS, _tones=INDUSTRY_TONE):
+    # The static blocks are bound as defaults so the body only interpolates locals
+    rank_code = rank.split(" ")[0]
+    gh = _ghosts.get(rank_code, _ghosts["E-5"])
+    kw = _numbered_list(keywords)
     return f"""
 CANDIDATE PROFILE:
   Rank: {rank}
@@ -277,13 +553,13 @@ CANDIDATE PROFILE:
 TARGET POSITION:
   Title: {target_title}
   Industry: {industry}
-  Industry Tone: {INDUSTRY_TONE.get(industry, INDUSTRY_TONE["Corporate (General)"])}
+  Industry Tone: {_tones.get(industry, _tones["Corporate (General)"])}
 
 CONFIRMED JD KEYWORDS TO MIRROR (address ALL of these):
 {kw}
 
 MILITARY-TO-CIVILIAN TRANSLATIONS:
-{trans}
+{_trans}
 
 GHOSTWRITER INFERRED SKILLS FOR {rank_code} (use if candidate data is thin or missing a JD requirement):
 {gh}
@@ -310,11 +586,61 @@ JOB DESCRIPTION:
 {job_desc[:2000]}"""
 
 
+# Parsed shapes of the JSON the analysis prompts ask for. They are parsed once
+# when the response arrives and stored in session_state as dicts; display code
+# only reads them. total=False because the model can omit fields.
+class MatchScore(TypedDict, total=False):
+    score: int
+    matched: list
+    gaps: list
+    summary: str
+
+
+class KeywordHit(TypedDict):
+    found: bool
+    count: int
+
+
+class ATSAnalysis(TypedDict, total=False):
+    keyword_hits: dict[str, KeywordHit]
+    overall_density_score: int
+    missing_keywords: list
+    suggestions: list
+
+
+# Gemini response_schema versions of the shapes above, for JSON mode. The ATS
+# report's keyword_hits map has model-chosen keys, which a schema cannot
+# express, so that prompt only gets the JSON mime type.
+_STRING_LIST = {"type": "ARRAY", "items": {"type": "STRING"}}
+KEYWORDS_SCHEMA = _STRING_LIST
+MATCH_SCORE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "score": {"type": "INTEGER"},
+        "matched": _STRING_LIST,
+        "gaps": _STRING_LIST,
+        "summary": {"type": "STRING"},
+    },
+    "required": ["score", "matched", "gaps", "summary"],
+}
+JD_ANALYSIS_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {"keywords": KEYWORDS_SCHEMA, "company": {"type": "STRING"}, "match_score": MATCH_SCORE_SCHEMA},
+    "required": ["keywords", "company", "match_score"],
+}
+
+
+_SCORING_GUIDE = """SCORING GUIDE:
+- 80-100: Strong match. Most keywords covered by experience or rank duties.
+- 60-79: Solid match. Some gaps but transferable skills fill them.
+- 40-59: Stretch role. Multiple hard-skill gaps. Upskilling needed.
+- Below 40: Significant mismatch. Major requirements missing."""
+
+
 def prompt_match_score(rank, years, keywords, user_data, target_title):
     rank_code = rank.split(" ")[0]
-    ghost = GHOSTWRITER.get(rank_code, GHOSTWRITER["E-5"])
-    gh = "\n".join(f"  - {s}" for s in ghost)
-    kw = "\n".join(f"  - {k}" for k in keywords)
+    gh = _GHOST_STRS.get(rank_code, _GHOST_STRS["E-5"])
+    kw = _bullets(keywords)
     return f"""You are a career match analyst for military veterans transitioning to civilian roles.
 CANDIDATE:
   Rank: {rank}
@@ -333,15 +659,68 @@ Return ONLY valid JSON with this exact structure. No preamble, no markdown fence
   "gaps": ["keyword3", "keyword4"],
   "summary": "<2 sentence assessment. Be direct about strengths and gaps.>"
 }}
-SCORING GUIDE:
-- 80-100: Strong match. Most keywords covered by experience or rank duties.
-- 60-79: Solid match. Some gaps but transferable skills fill them.
-- 40-59: Stretch role. Multiple hard-skill gaps. Upskilling needed.
-- Below 40: Significant mismatch. Major requirements missing."""
+{_SCORING_GUIDE}"""
+
+
+def prompt_jd_analysis(job_desc, rank, years, user_data, target_title):
+    """Keywords, company name, and match score in one request (see parse_jd_analysis)."""
+    rank_code = rank.split(" ")[0]
+    gh = _GHOST_STRS.get(rank_code, _GHOST_STRS["E-5"])
+    return f"""You are an expert ATS analyst and career match analyst for military veterans transitioning to civilian roles.
+Analyze the job description and candidate below and return ONE JSON object with three parts:
+1. "keywords": the 10-15 most important requirements, skills, and keywords from the job description.
+   Include BOTH hard skills AND soft skills (like Customer Service, Communication, Analytical Skills).
+   Prioritize skills that appear multiple times or are listed under "Required" / "Must Have."
+   Order from most critical to least.
+2. "company": the company or organization name from the job description. If you cannot determine it, use exactly: Unknown Company
+3. "match_score": how well the candidate matches the target role, judged against the keywords from part 1.
+   For EACH keyword, determine if the candidate has it (from their data or from standard {rank_code} duties).
+CANDIDATE:
+  Rank: {rank}
+  Years of Service: {years}
+  Experience Data: {user_data[:3000] if user_data else "[No resume provided. Using rank-based inference only.]"}
+  Standard skills for {rank_code} 92Y (Unit Supply Specialist):
+{gh}
+TARGET ROLE: {target_title}
+Return ONLY valid JSON with this exact structure. No preamble, no markdown fences:
+{{
+  "keywords": ["Supply Chain Management", "SAP ERP", "Customer Service", "Vendor Negotiation"],
+  "company": "<company name>",
+  "match_score": {{
+    "score": <integer 0-100>,
+    "matched": ["keyword1", "keyword2"],
+    "gaps": ["keyword3", "keyword4"],
+    "summary": "<2 sentence assessment. Be direct about strengths and gaps.>"
+  }}
+}}
+{_SCORING_GUIDE}
+JOB DESCRIPTION:
+{job_desc}"""
+
+
+def parse_jd_analysis(raw: str) -> tuple[list, str, MatchScore]:
+    """Return ``(keywords, company, match_score)`` from a prompt_jd_analysis response."""
+    data = orjson.loads(raw)
+    if not isinstance(data, dict):
+        raise ValueError("JD analysis response is not a JSON object.")
+    kws = data.get("keywords")
+    if not isinstance(kws, list) or len(kws) < 3:
+        raise ValueError("Too few keywords returned.")
+    score = data.get("match_score")
+    if not isinstance(score, dict) or "score" not in score:
+        raise ValueError("JD analysis response has no match score.")
+    company = data.get("company")
+    company = company.strip().strip('"').strip("'") if isinstance(company, str) else ""
+    return kws, company or "Unknown Company", score
 
 
 def prompt_resume(rank, years, industry, target_title, keywords, user_data, contact_info=None, gap_info=None, max_pages="2 pages (recommended)"):
     ctx = _context_block(rank, years, industry, target_title, keywords, user_data, contact_info, gap_info)
+    return f"""You are a Career Architect for U.S. Army 92Y veterans.
+{ctx}{_resume_task(rank, industry, target_title, contact_info, max_pages)}"""
+
+
+def _resume_task(rank, industry, target_title, contact_info=None, max_pages="2 pages (recommended)"):
     if "1 page" in max_pages:
         page_rule = """PAGE LENGTH: STRICT 1 PAGE. This is non-negotiable.
 - Professional Summary: 2 sentences max.
@@ -376,8 +755,7 @@ Keep every bullet under 2 lines. Cut anything that doesn't directly match a JD k
     else:
         header_block = f'# [Candidate Name]\n### **{target_title}**\n**[City, State]** | **[Phone]** | **[Email]** | **[LinkedIn URL]**'
     proj_header = _project_header(industry)
-    return f"""You are a Career Architect for U.S. Army 92Y veterans.
-{ctx}
+    return f"""
 
 {page_rule}
 
@@ -439,6 +817,11 @@ OUTPUT FORMAT (start immediately, no preamble, no "Here is the resume"):
 
 def prompt_cover_letter(rank, years, industry, target_title, keywords, user_data, contact_info=None, gap_info=None, company_name=None):
     ctx = _context_block(rank, years, industry, target_title, keywords, user_data, contact_info, gap_info)
+    return f"""You are a Career Architect writing a cover letter for a 92Y veteran.
+{ctx}{_cover_letter_task(contact_info, company_name)}"""
+
+
+def _cover_letter_task(contact_info=None, company_name=None):
     company = company_name if company_name and company_name != "Unknown Company" else "[Company Name]"
     if contact_info and contact_info.get("name"):
         cl_name = contact_info["name"]
@@ -450,8 +833,7 @@ def prompt_cover_letter(rank, years, industry, target_title, keywords, user_data
         cl_name = "[Full Name]"
         cl_header = "[Full Name]\n[City, State] | [Phone] | [Email]"
     today = datetime.now().strftime("%B %d, %Y")
-    return f"""You are a Career Architect writing a cover letter for a 92Y veteran.
-{ctx}
+    return f"""
 COMPANY: {company}
 RULES:
 - 3 paragraphs: Hook (who you are + why this role), Body (2-3 JD keywords matched to experience), Close (call to action).
@@ -482,7 +864,12 @@ def prompt_interview(rank, years, industry, target_title, keywords, user_data, c
     ctx = _context_block(rank, years, industry, target_title, keywords, user_data, contact_info, gap_info)
     company = company_name if company_name and company_name != "Unknown Company" else "the company"
     return f"""You are an Interview Coach for a 92Y veteran applying to {company}.
-{ctx}
+{ctx}{_interview_task(company_name)}"""
+
+
+def _interview_task(company_name=None):
+    company = company_name if company_name and company_name != "Unknown Company" else "the company"
+    return f"""
 Generate interview prep. Start immediately, no preamble. Do NOT use backticks or code formatting anywhere.
 
 ## LIKELY INTERVIEW QUESTIONS
@@ -516,8 +903,12 @@ Generate interview prep. Start immediately, no preamble. Do NOT use backticks or
 """
 
 
+PACKAGE_SECTIONS = ("resume_md", "cover_letter_md", "interview_md")
+DOCX_STATE_KEYS = {"resume_md": "resume_docx", "cover_letter_md": "cover_letter_docx", "interview_md": "interview_docx"}
+
+
 def prompt_ats_analysis(resume_text, keywords):
-    kw = "\n".join(f"  - {k}" for k in keywords)
+    kw = _bullets(keywords)
     return f"""You are an ATS (Applicant Tracking System) analyst.
 Analyze this resume against the target keywords and return a JSON report.
 RESUME TEXT:
@@ -537,12 +928,12 @@ Return ONLY valid JSON. No preamble, no markdown fences:
 SCORING: 90-100 = excellent keyword coverage, 70-89 = good, 50-69 = needs work, below 50 = poor."""
 
 
-def prompt_optimize_resume(current_resume, keywords, ats_data, industry, target_title, rank, max_pages="2 pages (recommended)"):
+def prompt_optimize_resume(current_resume, keywords, ats_data: ATSAnalysis, industry, target_title, rank, max_pages="2 pages (recommended)"):
     missing = ats_data.get("missing_keywords", [])
     suggestions = ats_data.get("suggestions", [])
-    kw = "\n".join(f"  - {k}" for k in keywords)
-    missing_str = "\n".join(f"  - {m}" for m in missing) if missing else "  None"
-    suggest_str = "\n".join(f"  - {s}" for s in suggestions) if suggestions else "  None"
+    kw = _bullets(keywords)
+    missing_str = _bullets(missing) if missing else "  None"
+    suggest_str = _bullets(suggestions) if suggestions else "  None"
     if "1 page" in max_pages:
         page_note = "STRICT 1 PAGE. Cut aggressively to fit."
     elif "3+" in max_pages:
@@ -591,162 +982,360 @@ OUTPUT: The complete optimized resume in the same markdown format. Start immedia
 # 7. DOCX EXPORT
 # ============================================================
 
-def markdown_to_docx(md_text: str) -> io.BytesIO:
-    doc = DocxDocument()
-    for section in doc.sections:
-        section.top_margin = Inches(0.7)
-        section.bottom_margin = Inches(0.7)
-        section.left_margin = Inches(0.8)
-        section.right_margin = Inches(0.8)
-    style_normal = doc.styles["Normal"]
-    style_normal.font.name = "Calibri"
-    style_normal.font.size = Pt(10.5)
-    style_normal.paragraph_format.space_after = Pt(2)
-    style_normal.paragraph_format.space_before = Pt(0)
-    lines = md_text.split("\n")
-    i = 0
-    while i < len(lines):
-        line = lines[i].strip()
-        if not line:
-            i += 1
-            continue
-        if line.startswith("# ") and not line.startswith("## "):
-            text = line.lstrip("# ").strip()
-            p = doc.add_paragraph()
-            p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-            run = p.add_run(text)
-            run.bold = True
-            run.font.size = Pt(18)
-            run.font.name = "Calibri"
-            run.font.color.rgb = RGBColor(0x1A, 0x1A, 0x2E)
-            p.paragraph_format.space_after = Pt(2)
-        elif line.startswith("### "):
-            text = re.sub(r"\*{1,2}", "", line.lstrip("# ").strip())
-            p = doc.add_paragraph()
-            p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-            run = p.add_run(text)
-            run.font.size = Pt(12)
-            run.font.name = "Calibri"
-            run.font.color.rgb = RGBColor(0x44, 0x44, 0x66)
-            p.paragraph_format.space_after = Pt(4)
-        elif line.startswith("## "):
-            text = line.lstrip("# ").strip()
-            p = doc.add_paragraph()
-            run = p.add_run(text.upper())
-            run.bold = True
-            run.font.size = Pt(11)
-            run.font.name = "Calibri"
-            run.font.color.rgb = RGBColor(0x1A, 0x1A, 0x2E)
-            p.paragraph_format.space_before = Pt(10)
-            p.paragraph_format.space_after = Pt(3)
-            from docx.oxml.ns import qn
-            pPr = p._p.get_or_add_pPr()
-            pBdr = pPr.makeelement(qn("w:pBdr"), {})
-            bottom = pBdr.makeelement(qn("w:bottom"), {
-                qn("w:val"): "single", qn("w:sz"): "4",
-                qn("w:space"): "1", qn("w:color"): "1A1A2E",
-            })
-            pBdr.append(bottom)
-            pPr.append(pBdr)
-        elif line.startswith("* ") or line.startswith("- "):
-            bullet_text = line[2:].strip()
-            p = doc.add_paragraph(style="List Bullet")
-            _add_runs(p, bullet_text)
-            p.paragraph_format.space_after = Pt(1)
-            p.paragraph_format.space_before = Pt(1)
-        elif "|" in line and ("@" in line or "phone" in line.lower() or "linkedin" in line.lower()):
-            text = re.sub(r"\*{1,2}", "", line).strip()
-            p = doc.add_paragraph()
-            p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-            run = p.add_run(text)
-            run.font.size = Pt(9.5)
-            run.font.name = "Calibri"
-            run.font.color.rgb = RGBColor(0x55, 0x55, 0x55)
-            p.paragraph_format.space_after = Pt(6)
-        elif line.startswith("|") and line.endswith("|"):
-            table_lines = []
-            while i < len(lines) and lines[i].strip().startswith("|"):
-                row = lines[i].strip()
-                if not all(c in "-| :" for c in row):
-                    cells = [c.strip() for c in row.split("|")[1:-1]]
-                    table_lines.append(cells)
-                i += 1
-            if table_lines:
-                ncols = max(len(r) for r in table_lines)
-                table = doc.add_table(rows=len(table_lines), cols=ncols)
-                table.style = "Light Grid Accent 1"
-                for ri, row_data in enumerate(table_lines):
-                    for ci, cell_text in enumerate(row_data):
-                        if ci < ncols:
-                            cell = table.cell(ri, ci)
-                            cell.text = re.sub(r"\*{1,2}", "", cell_text)
-                            for par in cell.paragraphs:
-                                for run in par.runs:
-                                    run.font.size = Pt(9.5)
-                                    run.font.name = "Calibri"
-            continue
-        elif line.startswith("**") and "**" in line[2:]:
-            p = doc.add_paragraph()
-            _add_runs(p, line)
-            p.paragraph_format.space_after = Pt(1)
-        elif line.startswith("*") and line.endswith("*") and not line.startswith("**"):
-            text = line.strip("*").strip()
-            p = doc.add_paragraph()
-            run = p.add_run(text)
-            run.italic = True
-            run.font.size = Pt(10)
-            run.font.name = "Calibri"
-            p.paragraph_format.space_after = Pt(1)
-        else:
-            p = doc.add_paragraph()
-            _add_runs(p, line)
-            p.paragraph_format.space_after = Pt(3)
+_STARS_RE = re.compile(r"\*{1,2}")
+
+_FONT = "Calibri"
+
+# The .docx is written as WordprocessingML text in one pass: each markdown line
+# appends a <w:p> (or <w:tbl>) fragment to a list, and the joined body is zipped
+# with fixed styles/numbering parts. Sizes are half-points (w:sz), spacing is
+# twentieths of a point (w:spacing), and margins/widths are twips.
+
+_W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+_XML_DECL = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+# Control characters are not allowed in XML 1.0
+_XML_INVALID_RE = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+_PPR_H1 = '<w:pPr><w:spacing w:after="40"/><w:jc w:val="center"/></w:pPr>'
+_RPR_H1 = '<w:rPr><w:b/><w:color w:val="1A1A2E"/><w:sz w:val="36"/></w:rPr>'
+_PPR_H2 = (
+    '<w:pPr><w:pBdr><w:bottom w:val="single" w:sz="4" w:space="1" w:color="1A1A2E"/></w:pBdr>'
+    '<w:spacing w:before="200" w:after="60"/></w:pPr>'
+)
+_RPR_H2 = '<w:rPr><w:b/><w:color w:val="1A1A2E"/><w:sz w:val="22"/></w:rPr>'
+_PPR_H3 = '<w:pPr><w:spacing w:after="80"/><w:jc w:val="center"/></w:pPr>'
+_RPR_H3 = '<w:rPr><w:color w:val="444466"/><w:sz w:val="24"/></w:rPr>'
+_PPR_BULLET = '<w:pPr><w:pStyle w:val="ListBullet"/><w:spacing w:before="20" w:after="20"/></w:pPr>'
+_PPR_CONTACT = '<w:pPr><w:spacing w:after="120"/><w:jc w:val="center"/></w:pPr>'
+_RPR_CONTACT = '<w:rPr><w:color w:val="555555"/><w:sz w:val="19"/></w:rPr>'
+_PPR_TIGHT = '<w:pPr><w:spacing w:after="20"/></w:pPr>'
+_RPR_ITALIC_LINE = '<w:rPr><w:i/><w:sz w:val="20"/></w:rPr>'
+_PPR_PARAGRAPH = '<w:pPr><w:spacing w:after="60"/></w:pPr>'
+_RPR_CELL = '<w:rPr><w:sz w:val="19"/></w:rPr>'
+# Keyed on (bold, italic) from _inline_spans
+_RPR_SPAN = {(False, False): "", (True, False): "<w:rPr><w:b/></w:rPr>", (False, True): "<w:rPr><w:i/></w:rPr>"}
+# Letter page less the 0.8" side margins
+_TEXT_WIDTH = 12240 - 2 * 1152
+
+_DOCX_STATIC_PARTS = {
+    "[Content_Types].xml": _XML_DECL + (
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/word/document.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+        '<Override PartName="/word/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.styles+xml"/>'
+        '<Override PartName="/word/numbering.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.numbering+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": _XML_DECL + (
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="word/document.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'
+    ),
+    "word/_rels/document.xml.rels": _XML_DECL + (
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="styles.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles"/>'
+        '<Relationship Id="rId2" Target="numbering.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/numbering"/>'
+        '</Relationships>'
+    ),
+    "word/styles.xml": _XML_DECL + (
+        f'<w:styles xmlns:w="{_W_NS}">'
+        '<w:docDefaults><w:rPrDefault><w:rPr>'
+        f'<w:rFonts w:ascii="{_FONT}" w:hAnsi="{_FONT}" w:eastAsia="{_FONT}" w:cs="{_FONT}"/>'
+        '<w:sz w:val="21"/><w:szCs w:val="21"/><w:lang w:val="en-US"/>'
+        '</w:rPr></w:rPrDefault>'
+        '<w:pPrDefault><w:pPr><w:spacing w:before="0" w:after="40"/></w:pPr></w:pPrDefault></w:docDefaults>'
+        '<w:style w:type="paragraph" w:default="1" w:styleId="Normal"><w:name w:val="Normal"/><w:qFormat/>'
+        '<w:pPr><w:spacing w:before="0" w:after="40"/></w:pPr></w:style>'
+        '<w:style w:type="paragraph" w:styleId="ListBullet"><w:name w:val="List Bullet"/>'
+        '<w:basedOn w:val="Normal"/><w:pPr><w:numPr><w:numId w:val="1"/></w:numPr>'
+        '<w:ind w:left="360" w:hanging="360"/></w:pPr></w:style>'
+        '<w:style w:type="table" w:default="1" w:styleId="TableNormal"><w:name w:val="Normal Table"/>'
+        '<w:tblPr><w:tblInd w:w="0" w:type="dxa"/><w:tblCellMar><w:top w:w="0" w:type="dxa"/>'
+        '<w:left w:w="108" w:type="dxa"/><w:bottom w:w="0" w:type="dxa"/><w:right w:w="108" w:type="dxa"/>'
+        '</w:tblCellMar></w:tblPr></w:style>'
+        '<w:style w:type="table" w:styleId="LightGrid-Accent1"><w:name w:val="Light Grid Accent 1"/>'
+        '<w:basedOn w:val="TableNormal"/><w:pPr><w:spacing w:after="0"/></w:pPr>'
+        '<w:tblPr><w:tblBorders>'
+        + "".join(
+            f'<w:{edge} w:val="single" w:sz="8" w:space="0" w:color="4F81BD"/>'
+            for edge in ("top", "left", "bottom", "right", "insideH", "insideV")
+        )
+        + '</w:tblBorders></w:tblPr>'
+        '<w:tblStylePr w:type="firstRow"><w:rPr><w:b/></w:rPr></w:tblStylePr></w:style>'
+        '</w:styles>'
+    ),
+    "word/numbering.xml": _XML_DECL + (
+        f'<w:numbering xmlns:w="{_W_NS}">'
+        '<w:abstractNum w:abstractNumId="0"><w:multiLevelType w:val="singleLevel"/>'
+        '<w:lvl w:ilvl="0"><w:start w:val="1"/><w:numFmt w:val="bullet"/><w:lvlText w:val="•"/>'
+        '<w:lvlJc w:val="left"/><w:pPr><w:ind w:left="360" w:hanging="360"/></w:pPr></w:lvl></w:abstractNum>'
+        '<w:num w:numId="1"><w:abstractNumId w:val="0"/></w:num>'
+        '</w:numbering>'
+    ),
+}
+_DOCUMENT_HEAD = _XML_DECL + f'<w:document xmlns:w="{_W_NS}"><w:body>'
+_DOCUMENT_TAIL = (
+    '<w:sectPr><w:pgSz w:w="12240" w:h="15840"/>'
+    '<w:pgMar w:top="1008" w:right="1152" w:bottom="1008" w:left="1152" w:header="720" w:footer="720" w:gutter="0"/>'
+    '</w:sectPr></w:body></w:document>'
+)
+
+
+def _xml_text(text):
+    text = text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+    if "\t" in text:
+        text = text.replace("\t", '</w:t><w:tab/><w:t xml:space="preserve">')
+    return _XML_INVALID_RE.sub("", text)
+
+
+def _run(text, rpr=""):
+    return f'<w:r>{rpr}<w:t xml:space="preserve">{_xml_text(text)}</w:t></w:r>'
+
+
+def _runs(text):
+    """Runs for a line with ``**bold**``/``*italic*`` markup."""
+    return "".join(_run(part, _RPR_SPAN[bold, italic]) for part, bold, italic in _inline_spans(text))
+
+
+def _emit_h1(out, line):
+    out.append(f'<w:p>{_PPR_H1}{_run(line.lstrip("# ").strip(), _RPR_H1)}</w:p>')
+
+
+def _emit_h2(out, line):
+    out.append(f'<w:p>{_PPR_H2}{_run(line.lstrip("# ").strip().upper(), _RPR_H2)}</w:p>')
+
+
+def _emit_h3(out, line):
+    text = _STARS_RE.sub("", line.lstrip("# ").strip())
+    out.append(f"<w:p>{_PPR_H3}{_run(text, _RPR_H3)}</w:p>")
+
+
+def _emit_bullet(out, line):
+    out.append(f"<w:p>{_PPR_BULLET}{_runs(line[2:].strip())}</w:p>")
+
+
+def _emit_contact(out, line):
+    out.append(f'<w:p>{_PPR_CONTACT}{_run(_STARS_RE.sub("", line).strip(), _RPR_CONTACT)}</w:p>')
+
+
+def _emit_bold_line(out, line):
+    out.append(f"<w:p>{_PPR_TIGHT}{_runs(line)}</w:p>")
+
+
+def _emit_italic_line(out, line):
+    out.append(f'<w:p>{_PPR_TIGHT}{_run(line.strip("*").strip(), _RPR_ITALIC_LINE)}</w:p>')
+
+
+def _emit_paragraph(out, line):
+    out.append(f"<w:p>{_PPR_PARAGRAPH}{_runs(line)}</w:p>")
+
+
+def _emit_table(out, lines, i):
+    """Render the stripped ``|`` rows starting at ``lines[i]``; return the index after the table."""
+    table_lines = []
+    while i < len(lines) and lines[i].startswith("|"):
+        row = lines[i]
+        if row.strip("-| :"):  # skip |---|:--| separator rows
+            cells = [c.strip() for c in row.split("|")[1:-1]]
+            table_lines.append(cells)
         i += 1
-    buf = io.BytesIO()
-    doc.save(buf)
-    buf.seek(0)
-    return buf
+    if table_lines:
+        ncols = max(len(r) for r in table_lines)
+        if not ncols:
+            return i
+        col_w = _TEXT_WIDTH // ncols
+        empty_cell = f'<w:tc><w:tcPr><w:tcW w:w="{col_w}" w:type="dxa"/></w:tcPr><w:p/></w:tc>'
+        out.append(
+            '<w:tbl><w:tblPr><w:tblStyle w:val="LightGrid-Accent1"/><w:tblW w:w="0" w:type="auto"/>'
+            '<w:tblLook w:val="04A0" w:firstRow="1" w:lastRow="0" w:firstColumn="1" w:lastColumn="0" '
+            'w:noHBand="0" w:noVBand="1"/></w:tblPr><w:tblGrid>'
+        )
+        out.append(f'<w:gridCol w:w="{col_w}"/>' * ncols)
+        out.append("</w:tblGrid>")
+        for row_data in table_lines:
+            out.append("<w:tr>")
+            for cell_text in row_data:
+                out.append(
+                    f'<w:tc><w:tcPr><w:tcW w:w="{col_w}" w:type="dxa"/></w:tcPr>'
+                    f'<w:p>{_run(_STARS_RE.sub("", cell_text), _RPR_CELL)}</w:p></w:tc>'
+                )
+            out.append(empty_cell * (ncols - len(row_data)))
+            out.append("</w:tr>")
+        out.append("</w:tbl>")
+    return i
+
+
+def _is_contact(line):
+    return "|" in line and ("@" in line or "phone" in line.lower() or "linkedin" in line.lower())
+
+
+def _handle_text(line, out, lines, i):
+    if _is_contact(line):
+        _emit_contact(out, line)
+    else:
+        _emit_paragraph(out, line)
+    return i + 1
+
+
+_HEADINGS = {1: _emit_h1, 2: _emit_h2, 3: _emit_h3}
+
+
+def _handle_heading(line, out, lines, i):
+    level = len(line) - len(line.lstrip("#"))
+    emit = _HEADINGS.get(level) if line[level:level + 1] == " " else None
+    if emit is None:
+        return _handle_text(line, out, lines, i)
+    emit(out, line)
+    return i + 1
+
+
+def _handle_star(line, out, lines, i):
+    if line[1:2] == " ":
+        _emit_bullet(out, line)
+    elif _is_contact(line):
+        _emit_contact(out, line)
+    elif line.startswith("**"):
+        if "**" in line[2:]:
+            _emit_bold_line(out, line)
+        else:
+            _emit_paragraph(out, line)
+    elif line.endswith("*"):
+        _emit_italic_line(out, line)
+    else:
+        _emit_paragraph(out, line)
+    return i + 1
+
+
+def _handle_dash(line, out, lines, i):
+    if line[1:2] == " ":
+        _emit_bullet(out, line)
+        return i + 1
+    return _handle_text(line, out, lines, i)
+
+
+def _handle_pipe(line, out, lines, i):
+    if line.endswith("|"):
+        return _emit_table(out, lines, i)
+    return _handle_text(line, out, lines, i)
+
+
+# Dispatch on the first character of the stripped line; each handler renders
+# one block and returns the index of the next unread line
+_HANDLERS = {
+    "#": _handle_heading,
+    "*": _handle_star,
+    "-": _handle_dash,
+    "|": _handle_pipe,
+}
 
 
-def _add_runs(paragraph, text):
-    parts = re.split(r"(\*\*.*?\*\*|\*.*?\*)", text)
-    for part in parts:
-        if not part:
+def markdown_to_docx(md_text: str) -> io.BytesIO:
+    return io.BytesIO(_build_docx_bytes(md_text))
+
+
+@functools.lru_cache(maxsize=32)
+def _build_docx_bytes(md_text: str) -> bytes:
+    import zipfile
+    out = [_DOCUMENT_HEAD]
+    stripped = [line.strip() for line in md_text.split("\n")]
+    # Blank lines stay in the list (they end a table) but cost one truth test here
+    next_i = 0
+    for i, line in enumerate(stripped):
+        if i < next_i or not line:
             continue
-        if part.startswith("**") and part.endswith("**"):
-            run = paragraph.add_run(part[2:-2])
-            run.bold = True
-        elif part.startswith("*") and part.endswith("*"):
-            run = paragraph.add_run(part[1:-1])
-            run.italic = True
+        next_i = _HANDLERS.get(line[0], _handle_text)(line, out, stripped, i)
+    out.append(_DOCUMENT_TAIL)
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, xml in _DOCX_STATIC_PARTS.items():
+            zf.writestr(name, xml)
+        zf.writestr("word/document.xml", "".join(out))
+    return buf.getvalue()
+
+
+def build_docx_bytes(md_text: str) -> bytes:
+    # A build takes a few milliseconds, so it runs inline; the caller keeps the
+    # bytes in session_state and the lru_cache covers repeat texts
+    return _build_docx_bytes(md_text)
+
+
+def _inline_spans(text):
+    """Yield ``(text, bold, italic)`` runs for ``**bold**``/``*italic*`` markup in one left-to-right scan."""
+    pos = 0
+    while True:
+        star = text.find("*", pos)
+        if star < 0:
+            break
+        end = text.find("**", star + 2) if text.startswith("**", star) else -1
+        if end >= 0:
+            inner, bold, nxt = text[star + 2:end], True, end + 2
         else:
-            run = paragraph.add_run(part)
-        run.font.name = "Calibri"
-        run.font.size = Pt(10.5)
+            end = text.find("*", star + 1)
+            if end < 0:
+                break
+            inner, bold, nxt = text[star + 1:end], False, end + 1
+        if star > pos:
+            yield text[pos:star], False, False
+        if inner:
+            yield inner, bold, not bold
+        pos = nxt
+    # A lone "*" left over right after a span is a stray marker; drop it
+    if pos < len(text) and text[pos:] != "*":
+        yield text[pos:], False, False
 
 
 # ============================================================
 # 8. ZIP EXPORT
 # ============================================================
 
-def create_zip_bundle(docx_files, company_slug, title_slug):
+_SLUG_RE = re.compile(r"[^a-zA-Z0-9]")
+_DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+
+def _docx_filename(kind, company_slug, title_slug):
+    return f"{kind}_{company_slug}_{title_slug}.docx"
+
+
+def _docx_download(label, data, kind, company_slug, title_slug):
+    st.download_button(
+        label,
+        data=data,
+        file_name=_docx_filename(kind, company_slug, title_slug),
+        mime=_DOCX_MIME,
+    )
+
+
+def create_zip_bundle(docx_files, company_slug, title_slug) -> bytes:
+    import zipfile
     zip_buf = io.BytesIO()
-    with zipfile.ZipFile(zip_buf, "w", zipfile.ZIP_DEFLATED) as zf:
-        for label, buf in docx_files.items():
-            if buf and buf.getbuffer().nbytes > 0:
-                zf.writestr(f"{label}_{company_slug}_{title_slug}.docx", buf.getvalue())
-    zip_buf.seek(0)
-    return zip_buf
+    # .docx files are already deflated zip containers; recompressing gains nothing
+    with zipfile.ZipFile(zip_buf, "w", zipfile.ZIP_STORED) as zf:
+        for label, data in docx_files.items():
+            if data:
+                zf.writestr(_docx_filename(label, company_slug, title_slug), data)
+    return zip_buf.getvalue()
 
 
 # ============================================================
 # 9. INPUT VALIDATION
 # ============================================================
 
+_WORD_RE = re.compile(r"\S+")
+JD_MIN_WORDS = 15
+
+
 def validate_inputs(api_key, job_desc, target_title):
     if not api_key:
         return "API Key is required."
-    if not job_desc or len(job_desc.split()) < 15:
+    # Count words only up to the minimum instead of splitting the whole JD
+    if not job_desc or sum(1 for _ in itertools.islice(_WORD_RE.finditer(job_desc), JD_MIN_WORDS)) < JD_MIN_WORDS:
         return "Job Description is too short. Paste the full JD (minimum ~15 words)."
     if not target_title or len(target_title.strip()) < 3:
         return "Target Job Title is required."
@@ -757,20 +1346,19 @@ def validate_inputs(api_key, job_desc, target_title):
 # 10. DISPLAY HELPERS
 # ============================================================
 
-def display_match_score(score_data):
-    score = score_data.get("score", 0)
-    matched = score_data.get("matched", [])
-    gaps = score_data.get("gaps", [])
-    summary = score_data.get("summary", "")
-    if score >= 80:
-        color, label = "#28a745", "Strong Match"
-    elif score >= 60:
-        color, label = "#17a2b8", "Solid Match"
-    elif score >= 40:
-        color, label = "#ffc107", "Stretch Role"
-    else:
-        color, label = "#dc3545", "Significant Gaps"
-    st.markdown(f"""
+# Score bands: bisect_right(thresholds, score) indexes the (color, label) style,
+# so a score equal to a threshold lands in the band above it
+_MATCH_THRESHOLDS = (40, 60, 80)
+_MATCH_STYLES = (("#dc3545", "Significant Gaps"), ("#ffc107", "Stretch Role"), ("#17a2b8", "Solid Match"), ("#28a745", "Strong Match"))
+_ATS_THRESHOLDS = (50, 70, 90)
+_ATS_STYLES = (("#dc3545", "Poor"), ("#ffc107", "Needs Work"), ("#17a2b8", "Good"), ("#28a745", "Excellent"))
+
+
+# The score cards are pure functions of a few scalars that stay fixed between
+# reruns, so their markup is built once and reused
+@functools.lru_cache(maxsize=32)
+def _match_html(score, label, color, summary):
+    return f"""
 <div style="border: 2px solid {color}; border-radius: 10px; padding: 20px; margin: 10px 0;">
     <div style="display: flex; align-items: center; gap: 20px; margin-bottom: 12px;">
         <div style="font-size: 48px; font-weight: bold; color: {color};">{score}%</div>
@@ -780,7 +1368,31 @@ def display_match_score(score_data):
         </div>
     </div>
 </div>
-""", unsafe_allow_html=True)
+"""
+
+
+@functools.lru_cache(maxsize=32)
+def _ats_html(density, label, color):
+    return f"""
+<div style="border: 2px solid {color}; border-radius: 8px; padding: 15px; margin: 10px 0;">
+    <div style="display: flex; align-items: center; gap: 15px;">
+        <div style="font-size: 36px; font-weight: bold; color: {color};">{density}%</div>
+        <div>
+            <div style="font-size: 16px; font-weight: bold; color: {color};">ATS Keyword Density: {label}</div>
+            <div style="font-size: 13px; color: #666;">How well your resume matches the job description keywords</div>
+        </div>
+    </div>
+</div>
+"""
+
+
+def display_match_score(score_data: MatchScore):
+    score = score_data.get("score", 0)
+    matched = score_data.get("matched", [])
+    gaps = score_data.get("gaps", [])
+    summary = score_data.get("summary", "")
+    color, label = _MATCH_STYLES[bisect.bisect_right(_MATCH_THRESHOLDS, score)]
+    st.markdown(_match_html(score, label, color, summary), unsafe_allow_html=True)
     mc1, mc2 = st.columns(2)
     with mc1:
         if matched:
@@ -806,32 +1418,15 @@ def display_match_score(score_data):
         )
 
 
-def display_ats_analysis(ats_data):
+def display_ats_analysis(ats_data: ATSAnalysis):
     if not ats_data:
         return
     density = ats_data.get("overall_density_score", 0)
     hits = ats_data.get("keyword_hits", {})
     missing = ats_data.get("missing_keywords", [])
     suggestions = ats_data.get("suggestions", [])
-    if density >= 90:
-        color, label = "#28a745", "Excellent"
-    elif density >= 70:
-        color, label = "#17a2b8", "Good"
-    elif density >= 50:
-        color, label = "#ffc107", "Needs Work"
-    else:
-        color, label = "#dc3545", "Poor"
-    st.markdown(f"""
-<div style="border: 2px solid {color}; border-radius: 8px; padding: 15px; margin: 10px 0;">
-    <div style="display: flex; align-items: center; gap: 15px;">
-        <div style="font-size: 36px; font-weight: bold; color: {color};">{density}%</div>
-        <div>
-            <div style="font-size: 16px; font-weight: bold; color: {color};">ATS Keyword Density: {label}</div>
-            <div style="font-size: 13px; color: #666;">How well your resume matches the job description keywords</div>
-        </div>
-    </div>
-</div>
-""", unsafe_allow_html=True)
+    color, label = _ATS_STYLES[bisect.bisect_right(_ATS_THRESHOLDS, density)]
+    st.markdown(_ats_html(density, label, color), unsafe_allow_html=True)
     if hits:
         found_count = sum(1 for v in hits.values() if v.get("found"))
         total = len(hits)
@@ -873,8 +1468,10 @@ st.markdown("##### Military-to-Civilian Resume Engine with ATS Keyword Matching"
 with st.sidebar:
     st.header("Authorization")
     default_key = ""
+    preferred_model = None
     try:
         default_key = st.secrets.get("GOOGLE_API_KEY", "")
+        preferred_model = st.secrets.get("GEMINI_MODEL")
     except Exception:
         pass
     if default_key:
@@ -906,24 +1503,27 @@ with st.sidebar:
 # 12. CONTACT INFO (collapsible)
 # ============================================================
 
-with st.expander("Your Contact Information (recommended for a polished resume)"):
-    st.caption("Fill in what you have. Anything left blank will show as a placeholder you can edit later in the .docx file.")
-    ci1, ci2 = st.columns(2)
-    with ci1:
-        contact_name = st.text_input("Full Name", placeholder="e.g., James Rodriguez")
-        contact_email = st.text_input("Email", placeholder="e.g., james.rodriguez@email.com")
-        contact_linkedin = st.text_input("LinkedIn URL (optional)", placeholder="e.g., linkedin.com/in/jrodriguez")
-    with ci2:
-        contact_city = st.text_input("City, State", placeholder="e.g., Augusta, GA")
-        contact_phone = st.text_input("Phone", placeholder="e.g., (706) 555-1234")
-
-contact_info = {
-    "name": contact_name.strip() if contact_name else "",
-    "email": contact_email.strip() if contact_email else "",
-    "city": contact_city.strip() if contact_city else "",
-    "phone": contact_phone.strip() if contact_phone else "",
-    "linkedin": contact_linkedin.strip() if contact_linkedin else "",
-}
+# Form sections are fragments: editing a field reruns only that fragment, and the
+# rest of the script reads the values back from session_state on its next run.
+
+@st.fragment
+def contact_form():
+    with st.expander("Your Contact Information (recommended for a polished resume)"):
+        st.caption("Fill in what you have. Anything left blank will show as a placeholder you can edit later in the .docx file.")
+        ci1, ci2 = st.columns(2)
+        with ci1:
+            st.text_input("Full Name", placeholder="e.g., James Rodriguez", key="contact_name")
+            st.text_input("Email", placeholder="e.g., james.rodriguez@email.com", key="contact_email")
+            st.text_input("LinkedIn URL (optional)", placeholder="e.g., linkedin.com/in/jrodriguez", key="contact_linkedin")
+        with ci2:
+            st.text_input("City, State", placeholder="e.g., Augusta, GA", key="contact_city")
+            st.text_input("Phone", placeholder="e.g., (706) 555-1234", key="contact_phone")
+
+
+CONTACT_FIELDS = ("name", "email", "city", "phone", "linkedin")
+
+contact_form()
+contact_info = {field: (st.session_state.get(f"contact_{field}") or "").strip() for field in CONTACT_FIELDS}
 if not contact_info["name"]:
     contact_info = None
 
@@ -931,41 +1531,49 @@ if not contact_info["name"]:
 # 13. EMPLOYMENT GAP (collapsible)
 # ============================================================
 
-with st.expander("Employment Gap? (optional)"):
-    st.caption("If you have a gap between military service and now, fill this in. The AI will frame it positively.")
-    has_gap = st.checkbox("I have an employment gap")
-    gap_info = None
-    if has_gap:
-        g1, g2 = st.columns(2)
-        with g1:
-            gap_start = st.text_input("Gap Start", placeholder="e.g., March 2022")
-        with g2:
-            gap_end = st.text_input("Gap End", value="Present", placeholder="e.g., Present")
-        gap_activities = st.multiselect(
-            "What did you do during the gap?",
-            options=[
-                "Completed Bachelor's Degree",
-                "Completed Master's Degree",
-                "Pursued Certifications (PMP, CSCP, etc.)",
-                "Freelance/Contract Work",
-                "Volunteered",
-                "Family Caregiving",
-                "Skills Training / Bootcamp",
-                "Started a Business",
-                "Relocated",
-            ],
-            default=["Pursued Certifications (PMP, CSCP, etc.)"],
-        )
-        gap_other = st.text_input("Other activities (optional):", placeholder="e.g., Completed SFL-TAP program")
-        all_activities = list(gap_activities)
-        if gap_other.strip():
-            all_activities.append(gap_other.strip())
-        gap_info = {
-            "has_gap": True,
-            "start": gap_start,
-            "end": gap_end,
-            "activities": all_activities,
-        }
+GAP_ACTIVITY_DEFAULT = ["Pursued Certifications (PMP, CSCP, etc.)"]
+
+
+@st.fragment
+def gap_form():
+    with st.expander("Employment Gap? (optional)"):
+        st.caption("If you have a gap between military service and now, fill this in. The AI will frame it positively.")
+        if st.checkbox("I have an employment gap", key="has_gap"):
+            g1, g2 = st.columns(2)
+            with g1:
+                st.text_input("Gap Start", placeholder="e.g., March 2022", key="gap_start")
+            with g2:
+                st.text_input("Gap End", value="Present", placeholder="e.g., Present", key="gap_end")
+            st.multiselect(
+                "What did you do during the gap?",
+                options=[
+                    "Completed Bachelor's Degree",
+                    "Completed Master's Degree",
+                    "Pursued Certifications (PMP, CSCP, etc.)",
+                    "Freelance/Contract Work",
+                    "Volunteered",
+                    "Family Caregiving",
+                    "Skills Training / Bootcamp",
+                    "Started a Business",
+                    "Relocated",
+                ],
+                default=GAP_ACTIVITY_DEFAULT,
+                key="gap_activities",
+            )
+            st.text_input("Other activities (optional):", placeholder="e.g., Completed SFL-TAP program", key="gap_other")
+
+
+gap_form()
+gap_info = None
+if st.session_state.get("has_gap"):
+    gap_other = (st.session_state.get("gap_other") or "").strip()
+    all_activities = [*st.session_state.get("gap_activities", GAP_ACTIVITY_DEFAULT), *([gap_other] if gap_other else [])]
+    gap_info = {
+        "has_gap": True,
+        "start": st.session_state.get("gap_start", ""),
+        "end": st.session_state.get("gap_end", "Present"),
+        "activities": all_activities,
+    }
 
 # ============================================================
 # 14. PROFILE & TARGET INPUTS
@@ -1042,36 +1650,58 @@ if st.button("Step 1: Extract JD Keywords", type="secondary"):
     else:
         try:
             with st.spinner("Scanning job description..."):
-                if not st.session_state.model:
-                    st.session_state.model = init_model(api_key)
-                raw = call_model(st.session_state.model, prompt_keywords(job_desc))
-                kws = json.loads(raw)
-                if not isinstance(kws, list) or len(kws) < 3:
-                    raise ValueError("Too few keywords returned.")
-                st.session_state.keywords = kws
+                model = st.session_state.model = init_model(api_key, preferred_model)
                 try:
-                    company = call_model(st.session_state.model, prompt_company_extract(job_desc))
-                    company = company.strip().strip('"').strip("'")
-                    st.session_state.company_name = company if company else "Unknown Company"
+                    # One round-trip for keywords, company, and score
+                    kws, company, score_data = parse_jd_analysis(cached_llm_call(
+                        prompt_jd_analysis(job_desc, rank, years, user_data, target_title),
+                        model.model_name,
+                        model,
+                        _validate=parse_jd_analysis,
+                        _fetch=functools.partial(call_model_json, generation_config=json_config(JD_ANALYSIS_SCHEMA)),
+                    ))
                 except Exception:
-                    st.session_state.company_name = "Unknown Company"
-                score_raw = call_model(
-                    st.session_state.model,
-                    prompt_match_score(rank, years, kws, user_data, target_title),
-                )
-                score_data = json.loads(score_raw)
+                    # Fall back to the three single-purpose prompts
+                    raw = cached_llm_call(
+                        prompt_keywords(job_desc),
+                        model.model_name,
+                        model,
+                        _validate=parse_keywords,
+                        _fetch=functools.partial(call_model_json, generation_config=json_config(KEYWORDS_SCHEMA)),
+                    )
+                    kws = parse_keywords(raw)
+                    try:
+                        company = cached_llm_call(prompt_company_extract(job_desc), model.model_name, model)
+                        company = company.strip().strip('"').strip("'") or "Unknown Company"
+                    except Exception:
+                        company = "Unknown Company"
+                    score_raw = cached_llm_call(
+                        prompt_match_score(rank, years, kws, user_data, target_title),
+                        model.model_name,
+                        model,
+                        _validate=orjson.loads,
+                        _fetch=functools.partial(call_model, generation_config=json_config(MATCH_SCORE_SCHEMA)),
+                    )
+                    score_data = orjson.loads(score_raw)
+                st.session_state.keywords = kws
+                st.session_state.company_name = company
                 st.session_state.match_score = score_data
                 st.session_state.keywords_confirmed = False
                 st.session_state.generation_complete = False
                 st.session_state.resume_md = None
                 st.session_state.cover_letter_md = None
                 st.session_state.interview_md = None
+                st.session_state.section_status = None
+                # A new Step 1 means new drafts, not replays of earlier ones
+                st.session_state.pop("_llm_cache", None)
                 st.session_state.ats_analysis = None
                 st.session_state.optimized_resume_md = None
                 st.session_state.optimize_used = False
                 st.session_state.generated_at = None
+                for docx_key in (*DOCX_STATE_KEYS.values(), "optimized_resume_docx"):
+                    st.session_state[docx_key] = None
                 st.rerun()
-        except json.JSONDecodeError:
+        except json.JSONDecodeError:  # also raised by orjson
             st.error("Failed to parse AI response. Try again.")
         except Exception as e:
             st.error(f"Analysis failed: {e}")
@@ -1081,26 +1711,25 @@ if st.button("Step 1: Extract JD Keywords", type="secondary"):
 # 16. SHOW MATCH SCORE + EDITABLE KEYWORDS
 # ============================================================
 
-if st.session_state.keywords and not st.session_state.keywords_confirmed:
-    if st.session_state.match_score:
-        display_match_score(st.session_state.match_score)
-        st.divider()
-    if st.session_state.company_name and st.session_state.company_name != "Unknown Company":
-        st.markdown(f"**Company Detected:** {st.session_state.company_name}")
+@st.fragment
+def keyword_editor():
+    """Editing keywords reruns only this fragment; the buttons rerun the whole app."""
+    import pandas as pd  # heavy; only needed once keywords exist
     st.markdown("**Extracted JD Keywords** (edit, remove, or add):")
-    edited = []
-    cols = st.columns(3)
-    for idx, kw in enumerate(st.session_state.keywords):
-        with cols[idx % 3]:
-            val = st.text_input(f"Keyword {idx+1}", value=kw, key=f"kw_{idx}")
-            if val.strip():
-                edited.append(val.strip())
-    add_kw = st.text_input("Add a keyword (optional):", key="add_kw", placeholder="e.g., Lean Six Sigma")
+    # One editor widget for the whole list; keyed on the list so a re-extract
+    # starts from fresh rows instead of replaying the previous edits
+    edited_df = st.data_editor(
+        pd.DataFrame({"keyword": st.session_state.keywords}),
+        num_rows="dynamic",
+        use_container_width=True,
+        hide_index=True,
+        column_config={"keyword": st.column_config.TextColumn("Keyword")},
+        key=f"kw_editor_{hash(tuple(map(str, st.session_state.keywords)))}",
+    )
     kc1, kc2 = st.columns(2)
     with kc1:
         if st.button("Confirm Keywords & Generate", type="primary"):
-            if add_kw.strip():
-                edited.append(add_kw.strip())
+            edited = [k.strip() for k in edited_df["keyword"].tolist() if isinstance(k, str) and k.strip()]
             st.session_state.keywords = edited
             st.session_state.keywords_confirmed = True
             st.rerun()
@@ -1112,6 +1741,15 @@ if st.session_state.keywords and not st.session_state.keywords_confirmed:
             st.rerun()
 
 
+if st.session_state.keywords and not st.session_state.keywords_confirmed:
+    if st.session_state.match_score:
+        display_match_score(st.session_state.match_score)
+        st.divider()
+    if st.session_state.company_name and st.session_state.company_name != "Unknown Company":
+        st.markdown(f"**Company Detected:** {st.session_state.company_name}")
+    keyword_editor()
+
+
 # ============================================================
 # 17. STEP 2: GENERATE ALL SECTIONS (error recovery)
 # ============================================================
@@ -1122,39 +1760,79 @@ if st.session_state.keywords_confirmed and not st.session_state.generation_compl
     company = st.session_state.company_name
     if not user_data:
         user_data = f"[NO DATA PROVIDED. Generate from scratch for {rank} with {years} years of 92Y service. Assume top 10% performer.]"
-    progress = st.progress(0, text="Starting generation...")
+    progress = st.progress(5, text="Generating resume, cover letter, and interview prep...")
     errors = []
-    try:
-        progress.progress(10, text="Generating resume...")
-        st.session_state.resume_md = clean_markdown(call_model(
-            model, prompt_resume(rank, years, target_ind, target_title, kws, user_data, contact_info, gap_info, resume_pages)
-        ))
-    except Exception as e:
-        errors.append(f"Resume: {e}")
-        st.session_state.resume_md = None
-    try:
-        progress.progress(35, text="Generating cover letter...")
-        st.session_state.cover_letter_md = clean_markdown(call_model(
-            model, prompt_cover_letter(rank, years, target_ind, target_title, kws, user_data, contact_info, gap_info, company)
-        ))
-    except Exception as e:
-        errors.append(f"Cover Letter: {e}")
-        st.session_state.cover_letter_md = None
-    try:
-        progress.progress(60, text="Generating interview prep...")
-        st.session_state.interview_md = clean_markdown(call_model(
-            model, prompt_interview(rank, years, target_ind, target_title, kws, user_data, contact_info, gap_info, company)
-        ))
-    except Exception as e:
-        errors.append(f"Interview Prep: {e}")
-        st.session_state.interview_md = None
+    status = st.session_state.section_status
+    if status is None:
+        status = st.session_state.section_status = {}
+    sections = {
+        "resume_md": ("Resume", prompt_resume(rank, years, target_ind, target_title, kws, user_data, contact_info, gap_info, resume_pages)),
+        "cover_letter_md": ("Cover Letter", prompt_cover_letter(rank, years, target_ind, target_title, kws, user_data, contact_info, gap_info, company)),
+        "interview_md": ("Interview Prep", prompt_interview(rank, years, target_ind, target_title, kws, user_data, contact_info, gap_info, company)),
+    }
+    sections = {key: section for key, section in sections.items() if status.get(key) != "ok"}
+
+    if sections:
+        # Threads rather than asyncio: the SDK's async client binds to the first
+        # event loop it sees, and every rerun would start a new one.
+        cache = st.session_state.setdefault("_llm_cache", {})
+        limiter = get_rate_limiter()
+        # Each worker appends its response chunks to its own list; the main thread
+        # renders them into per-section placeholders as they grow
+        streamed = {key: [] for key in sections}
+        shown = dict.fromkeys(sections, 0)
+        live_area = st.empty()
+        live = {}
+        with live_area.container():
+            for key, (label, _) in sections.items():
+                with st.expander(f"{label} (writing...)", expanded=key == "resume_md"):
+                    live[key] = st.empty()
+        with ThreadPoolExecutor(max_workers=len(sections)) as pool:
+            futures = {
+                pool.submit(
+                    call_model_cached, model, prompt, cache=cache,
+                    fetch=functools.partial(call_model, limiter=limiter, chunks=streamed[key]),
+                ): key
+                for key, (_, prompt) in sections.items()
+            }
+            pending = set(futures)
+            done = 0
+            while pending:
+                finished, pending = wait(pending, timeout=0.25, return_when=FIRST_COMPLETED)
+                for key, chunks in streamed.items():
+                    if len(chunks) != shown[key]:
+                        shown[key] = len(chunks)
+                        live[key].markdown("".join(chunks))
+                for fut in finished:
+                    key = futures[fut]
+                    label = sections[key][0]
+                    try:
+                        st.session_state[key] = clean_markdown(fut.result())
+                        status[key] = "ok"
+                    except Exception as e:
+                        errors.append(f"{label}: {e}")
+                        st.session_state[key] = None
+                        st.session_state[DOCX_STATE_KEYS[key]] = None
+                        status[key] = "fail"
+                    done += 1
+                    progress.progress(5 + done * 70 // len(sections), text=f"{label} finished ({done}/{len(sections)})...")
+        live_area.empty()
     if st.session_state.resume_md:
         try:
             progress.progress(80, text="Running ATS keyword analysis...")
-            ats_raw = call_model(model, prompt_ats_analysis(st.session_state.resume_md, kws))
-            st.session_state.ats_analysis = json.loads(ats_raw)
+            ats_raw = cached_llm_call(
+                prompt_ats_analysis(st.session_state.resume_md, kws),
+                model.model_name,
+                model,
+                _validate=orjson.loads,
+                _fetch=functools.partial(call_model, generation_config=json_config()),
+            )
+            st.session_state.ats_analysis = orjson.loads(ats_raw)
         except Exception:
             st.session_state.ats_analysis = None
+    for key in PACKAGE_SECTIONS:
+        if st.session_state[key]:
+            st.session_state[DOCX_STATE_KEYS[key]] = build_docx_bytes(st.session_state[key])
     progress.progress(100, text="Complete!")
     if st.session_state.resume_md or st.session_state.cover_letter_md or st.session_state.interview_md:
         st.session_state.generation_complete = True
@@ -1187,8 +1865,15 @@ if st.session_state.generation_complete:
         st.markdown(" | ".join(meta_parts))
     company_slug = "Resume"
     if st.session_state.company_name and st.session_state.company_name != "Unknown Company":
-        company_slug = re.sub(r"[^a-zA-Z0-9]", "_", st.session_state.company_name)
-    title_slug = re.sub(r"[^a-zA-Z0-9]", "_", target_title) if target_title else "Role"
+        company_slug = _SLUG_RE.sub("_", st.session_state.company_name)
+    title_slug = _SLUG_RE.sub("_", target_title) if target_title else "Role"
+
+    failed = [key for key, state in (st.session_state.section_status or {}).items() if state == "fail"]
+    if failed:
+        st.warning(f"{len(failed)} section(s) failed to generate. The others are kept below.")
+        if st.button("Retry failed sections", key="retry_failed"):
+            st.session_state.generation_complete = False
+            st.rerun()
 
     # ATS Analysis
     if st.session_state.ats_analysis:
@@ -1214,6 +1899,11 @@ if st.session_state.generation_complete:
             if tab_key == "resume":
                 # Show optimized version if available, original otherwise
                 active_resume = st.session_state.optimized_resume_md or st.session_state.resume_md
+                resume_docx = (
+                    st.session_state.optimized_resume_docx
+                    if st.session_state.optimized_resume_md
+                    else st.session_state.resume_docx
+                )
 
                 # If optimized, show toggle
                 if st.session_state.optimized_resume_md:
@@ -1221,17 +1911,12 @@ if st.session_state.generation_complete:
                     show_original = st.checkbox("Show original (pre-optimization)", value=False, key="show_orig")
                     if show_original:
                         active_resume = st.session_state.resume_md
+                        resume_docx = st.session_state.resume_docx
                         st.caption("Showing original version.")
 
                 st.markdown(active_resume)
-                resume_docx = markdown_to_docx(active_resume)
                 docx_files["Resume"] = resume_docx
-                st.download_button(
-                    "Download Resume (.docx)",
-                    data=resume_docx,
-                    file_name=f"Resume_{company_slug}_{title_slug}.docx",
-                    mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-                )
+                _docx_download("Download Resume (.docx)", resume_docx, "Resume", company_slug, title_slug)
 
                 # Optimize button (one-time use)
                 if (
@@ -1266,45 +1951,48 @@ if st.session_state.generation_complete:
                                 st.session_state.optimize_used = True
                                 # Re-run ATS analysis on optimized version
                                 try:
-                                    new_ats_raw = call_model(
-                                        st.session_state.model,
+                                    new_ats_raw = cached_llm_call(
                                         prompt_ats_analysis(optimized, st.session_state.keywords),
+                                        st.session_state.model.model_name,
+                                        st.session_state.model,
+                                        _validate=orjson.loads,
+                                        _fetch=functools.partial(call_model, generation_config=json_config()),
                                     )
-                                    st.session_state.ats_analysis = json.loads(new_ats_raw)
+                                    st.session_state.ats_analysis = orjson.loads(new_ats_raw)
                                 except Exception:
                                     pass
+                                st.session_state.optimized_resume_docx = build_docx_bytes(
+                                    st.session_state.optimized_resume_md
+                                )
                                 st.rerun()
                             except Exception as e:
                                 st.error(f"Optimization failed: {e}")
 
             elif tab_key == "cover_letter":
-                st.markdown(clean_markdown(st.session_state.cover_letter_md))
-                cl_docx = markdown_to_docx(clean_markdown(st.session_state.cover_letter_md))
+                cl_md = clean_markdown(st.session_state.cover_letter_md)
+                st.markdown(cl_md)
+                cl_docx = st.session_state.cover_letter_docx
                 docx_files["Cover_Letter"] = cl_docx
-                st.download_button(
-                    "Download Cover Letter (.docx)",
-                    data=cl_docx,
-                    file_name=f"Cover_Letter_{company_slug}_{title_slug}.docx",
-                    mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-                )
+                _docx_download("Download Cover Letter (.docx)", cl_docx, "Cover_Letter", company_slug, title_slug)
             elif tab_key == "interview":
-                st.markdown(clean_markdown(st.session_state.interview_md))
-                int_docx = markdown_to_docx(clean_markdown(st.session_state.interview_md))
+                int_md = clean_markdown(st.session_state.interview_md)
+                st.markdown(int_md)
+                int_docx = st.session_state.interview_docx
                 docx_files["Interview_Prep"] = int_docx
-                st.download_button(
-                    "Download Interview Prep (.docx)",
-                    data=int_docx,
-                    file_name=f"Interview_Prep_{company_slug}_{title_slug}.docx",
-                    mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-                )
+                _docx_download("Download Interview Prep (.docx)", int_docx, "Interview_Prep", company_slug, title_slug)
 
     # Download All
     if len(docx_files) > 1:
         st.divider()
-        zip_bundle = create_zip_bundle(docx_files, company_slug, title_slug)
+        # bytes cache their own hash, so after the first rerun this key is O(1)
+        # to compute, unlike st.cache_data, which rehashes the contents each time
+        zip_key = (hash(tuple(docx_files.items())), company_slug, title_slug)
+        if st.session_state.get("_zip_key") != zip_key:
+            st.session_state._zip_bundle = create_zip_bundle(docx_files, company_slug, title_slug)
+            st.session_state._zip_key = zip_key
         st.download_button(
             "Download All (.zip)",
-            data=zip_bundle,
+            data=st.session_state._zip_bundle,
             file_name=f"Career_Package_{company_slug}_{title_slug}.zip",
             mime="application/zip",
         )
@@ -1317,4 +2005,5 @@ if st.session_state.generation_complete:
     if st.button("Start Over"):
         for key in STATE_DEFAULTS:
             st.session_state[key] = STATE_DEFAULTS[key]
+        st.session_state.pop("_llm_cache", None)
         st.rerun()